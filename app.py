@@ -3,57 +3,191 @@ FastAPI Web Application for Chatterbox Turbo TTS
 High-performance API and Web UI
 """
 import os
-import io
+import asyncio
+import gc
+import hashlib
+import logging
+import queue
 import random
+import re
+import secrets
+import stat
+import struct
+import threading
+import time
 import tempfile
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager, suppress
 from pathlib import Path
+from types import MappingProxyType
 from typing import Optional, Union
+
+# Must be set before torch initializes CUDA. Expandable segments let the caching
+# allocator grow/shrink mappings in place instead of fragmenting into fixed blocks
+# as output lengths vary between requests.
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True,garbage_collection_threshold:0.8")
+
 import numpy as np
 import torch
-import soundfile as sf
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Header, Depends, Query
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, RedirectResponse, Response, StreamingResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from starlette.background import BackgroundTask
 import uvicorn
 
 from chatterbox.tts_turbo import ChatterboxTurboTTS
 
+# Nothing here trains. Grad mode is thread-local, so this covers the main thread;
+# generation in worker threads is wrapped in inference_context.
+torch.set_grad_enabled(False)
+
 # Configuration
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# Mixed-precision autocast for inference on GPU (set TTS_AUTOCAST=0 to run in full fp32); CPU always stays fp32
+USE_AUTOCAST = DEVICE == "cuda" and os.environ.get("TTS_AUTOCAST", "1") == "1"
+# bf16 on Ampere and newer, fp16 on older GPUs without fast bf16
+AUTOCAST_DTYPE = torch.bfloat16 if USE_AUTOCAST and torch.cuda.get_device_capability()[0] >= 8 else torch.float16
+# torch.compile the transformer backbone at startup (opt-in: compile time is significant)
+USE_COMPILE = os.environ.get("TTS_COMPILE", "0") == "1"
+# Max generations running on the device at once; others queue on the event loop.
+# Applies per worker process; every worker loads its own model onto the same device.
+TTS_CONCURRENCY = int(os.environ.get("TTS_CONCURRENCY", "1"))
+if TTS_CONCURRENCY < 1:
+    raise ValueError(f"TTS_CONCURRENCY must be at least 1, got {TTS_CONCURRENCY}")
+GPU_SEMAPHORE = asyncio.Semaphore(TTS_CONCURRENCY)
+# Generations holding / queued on GPU_SEMAPHORE (only touched on the event loop), reported by /api/health
+GENERATIONS_RUNNING = 0
+GENERATIONS_WAITING = 0
+# Reject new TTS requests with 503 once this many admitted requests are queued
+# beyond TTS_CONCURRENCY (0 = unlimited)
+MAX_QUEUED_GENERATIONS = int(os.environ.get("TTS_MAX_QUEUE", "32"))
+if MAX_QUEUED_GENERATIONS < 0:
+    raise ValueError(f"TTS_MAX_QUEUE must be at least 0, got {MAX_QUEUED_GENERATIONS}")
+# TTS requests admitted by admission_control and not finished yet (only touched on the event loop)
+TTS_REQUESTS_ADMITTED = 0
+# Retry-After (seconds) sent with those 503s
+RETRY_AFTER_SECONDS = 2
+# Return cached CUDA memory to the driver after every generation (opt-in: slows the next request)
+EMPTY_CACHE_AFTER_REQUEST = DEVICE == "cuda" and os.environ.get("TTS_EMPTY_CACHE", "0") == "1"
+# Log through uvicorn's logger so messages share its handlers and format
+logger = logging.getLogger("uvicorn.error")
+# Requests whose response takes this long to start are logged (replaces the per-request uvicorn access log)
+SLOW_REQUEST_MS = float(os.environ.get("TTS_SLOW_REQUEST_MS", "10000"))
+# Token for /api/admin/* endpoints; admin endpoints are disabled when unset
+ADMIN_TOKEN = os.environ.get("TTS_ADMIN_TOKEN")
 MODEL_CACHE = {}
+MODEL_LOCK = threading.Lock()
+# Constant audio response headers (never mutated per request); X-Sample-Rate is added by get_model
+WAV_HEADERS = {"Content-Disposition": 'attachment; filename="tts_output.wav"'}
+STREAM_HEADERS = {}
+# LRU of prepared voice conditionals (speaker embedding + prompt tokens, already on DEVICE)
+# keyed by reference-audio content hash, so re-used references skip the encoders
+CONDITIONALS_CACHE = OrderedDict()
+CONDITIONALS_CACHE_SIZE = int(os.environ.get("TTS_CONDITIONALS_CACHE_SIZE", "64"))
+CONDITIONALS_LOCK = threading.Lock()
+# model.conds and the global RNG are shared by every generation on the model, so setting them and
+# running model.generate must not interleave across threads (even when TTS_CONCURRENCY > 1)
+GENERATE_LOCK = threading.Lock()
+# LRU of encoded WAVs for seeded requests, keyed by voice and generation params (0 disables).
+# Only touched on the event loop, so it needs no lock.
+AUDIO_CACHE = OrderedDict()
+AUDIO_CACHE_SIZE = int(os.environ.get("TTS_AUDIO_CACHE_SIZE", "0"))
+# Prepare conditionals for every voice/ file at startup instead of on first use
+PREWARM_VOICES = os.environ.get("TTS_PREWARM_VOICES", "0") == "1"
 VOICE_FOLDER = Path("voice")
-AVAILABLE_VOICES = {}
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+# Browser cache lifetime for the web UI; after it expires the ETag still allows 304 revalidation
+STATIC_CACHE_CONTROL = "public, max-age=3600"
+# Read-only snapshots, replaced wholesale by scan_voice_folder (never mutated in place)
+AVAILABLE_VOICES = MappingProxyType({})
+# Lowercased index of AVAILABLE_VOICES for case-insensitive lookups
+AVAILABLE_VOICES_LOWER = MappingProxyType({})
+# /api/voices payload, derived from AVAILABLE_VOICES whenever it is rebuilt
+VOICES_RESPONSE = {"voices": [], "count": 0}
+
+# Chunk size used when spooling uploaded reference audio to disk (each read is a threadpool hop)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Uploaded references go to a dedicated directory on RAM-backed tmpfs when available (None = system temp dir)
+DEFAULT_UPLOAD_DIR = "/dev/shm/chatterbox_uploads" if os.path.isdir("/dev/shm") else None
+UPLOAD_DIR = os.environ.get("TTS_UPLOAD_DIR") or DEFAULT_UPLOAD_DIR
+# Files in DEFAULT_UPLOAD_DIR older than this were leaked by a crashed process and are swept at startup
+UPLOAD_STALE_SECONDS = 3600
+# Name prefix of upload temp files; the startup sweep only ever removes files carrying it
+UPLOAD_PREFIX = "tts_upload_"
+
+# Shared pool of pinned host buffers for async device -> host copies of int16 PCM.
+# Bounded by TTS_CONCURRENCY rather than kept per thread, since the threadpool can run far more threads
+PINNED_PCM16_POOL = queue.LifoQueue(maxsize=TTS_CONCURRENCY)
+# Per-thread reusable host arrays for audio post-processing, sized for 30 s at 48 kHz up front
+AUDIO_SCRATCH = threading.local()
+AUDIO_SCRATCH_MIN_SAMPLES = 30 * 48000
+
+# Sentence boundaries used to split text for streaming synthesis
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+# How many sentences streaming synthesis may generate ahead of what has been sent
+STREAM_PREFETCH_SENTENCES = 2
 
-# Supported paralinguistic tags
-EVENT_TAGS = [
+# Supported paralinguistic tags (immutable: served as-is by /api/tags)
+EVENT_TAGS = (
     "[clear throat]", "[sigh]", "[shush]", "[cough]", "[groan]",
     "[sniff]", "[gasp]", "[chuckle]", "[laugh]"
-]
+)
+
+def build_voices_response(voices: dict) -> dict:
+    """Build the /api/voices payload: unique voice names (without duplicates from extension variations)"""
+    unique_voices = {}
+    for key, path in voices.items():
+        if key.endswith('.wav'):
+            unique_voices[key] = path
+        elif f"{key}.wav" not in voices:
+            unique_voices[key] = path
+    
+    return {
+        "voices": sorted(unique_voices.keys()),
+        "count": len(set(voices.values()))
+    }
 
 def scan_voice_folder():
     """Scan voice folder for available voice files at startup.
     NOTE: This function only READS from the voice folder - it NEVER deletes or modifies files.
     """
-    global AVAILABLE_VOICES
-    AVAILABLE_VOICES = {}
+    global AVAILABLE_VOICES, AVAILABLE_VOICES_LOWER, VOICES_RESPONSE
+    voices = {}
+    voices_lower = {}
     
     if not VOICE_FOLDER.exists():
         VOICE_FOLDER.mkdir(exist_ok=True)
         print(f"Created voice folder: {VOICE_FOLDER}")
+        AVAILABLE_VOICES = AVAILABLE_VOICES_LOWER = MappingProxyType({})
+        VOICES_RESPONSE = build_voices_response(voices)
         return
     
     # Scan for audio files (READ-ONLY - never deletes or modifies files)
     audio_extensions = {'.wav', '.mp3', '.flac', '.ogg', '.m4a'}
-    for file_path in VOICE_FOLDER.iterdir():
-        if file_path.is_file() and file_path.suffix.lower() in audio_extensions:
+    # Resolve the folder once; scandir entries carry their file type, so no stat per file
+    base = VOICE_FOLDER.resolve()
+    with os.scandir(base) as entries:
+        for entry in entries:
+            name_without_ext, ext = os.path.splitext(entry.name)
+            if ext.lower() not in audio_extensions or not entry.is_file():
+                continue
             # Store both with and without extension for easy lookup
-            name_with_ext = file_path.name
-            name_without_ext = file_path.stem
-            full_path = str(file_path.resolve())
+            name_with_ext = entry.name
+            full_path = str(base / entry.name)
             
-            AVAILABLE_VOICES[name_with_ext] = full_path
-            AVAILABLE_VOICES[name_without_ext] = full_path
+            voices[name_with_ext] = full_path
+            voices[name_without_ext] = full_path
+    
+    # First file wins when names differ only by case
+    for key, path in voices.items():
+        voices_lower.setdefault(key.lower(), path)
+    
+    # Publish with plain reference swaps: readers see the old or the new snapshot, never a partial one
+    AVAILABLE_VOICES = MappingProxyType(voices)
+    AVAILABLE_VOICES_LOWER = MappingProxyType(voices_lower)
+    VOICES_RESPONSE = build_voices_response(voices)
     
     if AVAILABLE_VOICES:
         print(f"Found {len(set(AVAILABLE_VOICES.values()))} voice file(s) in {VOICE_FOLDER}:")
@@ -62,6 +196,16 @@ def scan_voice_folder():
     else:
         print(f"No voice files found in {VOICE_FOLDER}")
 
+def lookup_voice(voice_name: str) -> Optional[str]:
+    """Find a voice/ file by name: exact match first, then case-insensitive with or without .wav.
+    Pure dict lookups - no filesystem access.
+    """
+    path = AVAILABLE_VOICES.get(voice_name)
+    if path:
+        return path
+    voice_name_lower = voice_name.lower()
+    return AVAILABLE_VOICES_LOWER.get(voice_name_lower) or AVAILABLE_VOICES_LOWER.get(f"{voice_name_lower}.wav")
+
 def resolve_voice_path(voice_name: Optional[str] = None, audio_prompt_path: Optional[str] = None) -> Optional[str]:
     """
     Resolve voice path from voice_name or audio_prompt_path.
@@ -73,17 +217,9 @@ def resolve_voice_path(voice_name: Optional[str] = None, audio_prompt_path: Opti
     
     # If voice_name is provided, look it up in available voices
     if voice_name:
-        # Try exact match first
-        if voice_name in AVAILABLE_VOICES:
-            return AVAILABLE_VOICES[voice_name]
-        # Try with .wav extension
-        if f"{voice_name}.wav" in AVAILABLE_VOICES:
-            return AVAILABLE_VOICES[f"{voice_name}.wav"]
-        # Try case-insensitive match
-        voice_name_lower = voice_name.lower()
-        for key, path in AVAILABLE_VOICES.items():
-            if key.lower() == voice_name_lower or key.lower() == f"{voice_name_lower}.wav":
-                return path
+        path = lookup_voice(voice_name)
+        if path:
+            return path
     
     # Fall back to audio_prompt_path if provided
     if audio_prompt_path:
@@ -91,18 +227,114 @@ def resolve_voice_path(voice_name: Optional[str] = None, audio_prompt_path: Opti
     
     return None
 
-# Scan voice folder at startup
+async def resolve_request_voice(request: "TTSRequest") -> Optional[str]:
+    """resolve_voice_path for a request; only a client-supplied path needs a filesystem
+    check, which then runs off the event loop"""
+    if request.audio_prompt_path:
+        return await asyncio.to_thread(resolve_voice_path, request.voice_name, request.audio_prompt_path)
+    return lookup_voice(request.voice_name) if request.voice_name else None
+
+def sweep_upload_dir():
+    """Create the upload directory and free tmpfs memory held by uploads a crashed process left behind.
+    Only the default directory is swept; a TTS_UPLOAD_DIR is never cleaned.
+    Files are only removed once stale, so uploads in flight in other workers are left alone.
+    """
+    global UPLOAD_DIR
+    if not UPLOAD_DIR:
+        return
+    # The default path is predictable in a world-writable directory: open it without following
+    # symlinks and only use it if it is a real directory we own, otherwise use the system temp dir
+    # (a file or dangling symlink squatting on the path must not stop the server from starting)
+    try:
+        os.makedirs(UPLOAD_DIR, mode=0o700, exist_ok=True)
+        if UPLOAD_DIR != DEFAULT_UPLOAD_DIR:
+            return
+        dir_fd = os.open(UPLOAD_DIR, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW)
+    except OSError as e:
+        print(f"Not using {UPLOAD_DIR} for uploads ({e}); falling back to the system temp dir")
+        UPLOAD_DIR = None
+        return
+    try:
+        st = os.fstat(dir_fd)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+            print(f"Not using {UPLOAD_DIR} for uploads (not a directory owned by this user); falling back to the system temp dir")
+            UPLOAD_DIR = None
+            return
+        os.fchmod(dir_fd, 0o700)
+        
+        cutoff = time.time() - UPLOAD_STALE_SECONDS
+        with os.scandir(dir_fd) as entries:
+            for entry in entries:
+                if not entry.name.startswith(UPLOAD_PREFIX):
+                    continue
+                with suppress(OSError):
+                    if entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                        os.unlink(entry.name, dir_fd=dir_fd)
+    finally:
+        os.close(dir_fd)
+
+# Scan voice folder and prepare the upload directory at startup
 scan_voice_folder()
+sweep_upload_dir()
 
 # Initialize FastAPI app
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load and warm up the model once per worker before it accepts requests"""
+    await load_model()
+    yield
+
 app = FastAPI(
     title="Chatterbox Turbo TTS API",
     description="High-performance Text-to-Speech API with Web UI",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
+class SlowRequestLogger:
+    """Pure ASGI middleware that logs only requests whose response took threshold_ms or longer to start.
+    Timed to the response start, so a stream counts its time to first audio rather than its full length.
+    (Avoids BaseHTTPMiddleware, which re-wraps every response body.)
+    """
+    def __init__(self, app, threshold_ms: float):
+        self.app = app
+        self.threshold_ms = threshold_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+        started = None
+
+        async def send_wrapper(message):
+            nonlocal status, started
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                started = time.perf_counter()
+                self.log_if_slow(scope, status, started - start)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if started is None:
+                self.log_if_slow(scope, status, time.perf_counter() - start)
+
+    def log_if_slow(self, scope, status: int, elapsed: float):
+        elapsed_ms = elapsed * 1000
+        if elapsed_ms >= self.threshold_ms:
+            logger.warning("Slow request: %s %s -> %d in %.0f ms", scope["method"], scope["path"], status, elapsed_ms)
+
+app.add_middleware(SlowRequestLogger, threshold_ms=SLOW_REQUEST_MS)
+
 # Request/Response models
 class TTSRequest(BaseModel):
+    # Immutable once validated; unknown fields are dropped without extra processing
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     text: str = Field(..., description="Text to synthesize (supports paralinguistic tags)")
     temperature: float = Field(0.8, ge=0.05, le=2.0, description="Sampling temperature")
     top_p: float = Field(0.95, ge=0.0, le=1.0, description="Top-p (nucleus) sampling")
@@ -114,6 +346,66 @@ class TTSRequest(BaseModel):
     voice_name: Optional[str] = Field(None, description="Name of voice file from voice/ folder (e.g., '20secondchris' or '20secondchris.wav'). Use /api/voices to list available voices.")
     audio_prompt_path: Optional[str] = Field(None, description="Path to reference audio file (if using file upload, use /api/tts/upload endpoint). Ignored if voice_name is provided.")
 
+    @classmethod
+    def as_form(
+        cls,
+        text: str = Form(...),
+        voice_name: Optional[str] = Form(None),
+        temperature: float = Form(0.8),
+        top_p: float = Form(0.95),
+        top_k: int = Form(1000),
+        repetition_penalty: float = Form(1.2),
+        min_p: float = Form(0.0),
+        norm_loudness: bool = Form(True),
+        seed: Optional[int] = Form(None),
+    ) -> "TTSRequest":
+        """Parse multipart form fields into a TTSRequest with a single validation pass"""
+        return cls.from_params(
+            text=text,
+            voice_name=voice_name,
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k,
+            repetition_penalty=repetition_penalty,
+            min_p=min_p,
+            norm_loudness=norm_loudness,
+            seed=seed,
+        )
+
+    @classmethod
+    def as_query(
+        cls,
+        text: str = Query(...),
+        voice_name: Optional[str] = Query(None),
+        temperature: float = Query(0.8),
+        top_p: float = Query(0.95),
+        top_k: int = Query(1000),
+        repetition_penalty: float = Query(1.2),
+        min_p: float = Query(0.0),
+        norm_loudness: bool = Query(True),
+        seed: Optional[int] = Query(None),
+    ) -> "TTSRequest":
+        """Parse query parameters into a TTSRequest (for GET endpoints usable as an <audio> src)"""
+        return cls.from_params(
+            text=text,
+            voice_name=voice_name,
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k,
+            repetition_penalty=repetition_penalty,
+            min_p=min_p,
+            norm_loudness=norm_loudness,
+            seed=seed,
+        )
+
+    @classmethod
+    def from_params(cls, **params) -> "TTSRequest":
+        """Validate non-JSON parameters, reporting errors as 422 like the JSON endpoint instead of a 500"""
+        try:
+            return cls.model_validate(params)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+
 class TTSResponse(BaseModel):
     success: bool
     message: str
@@ -122,730 +414,566 @@ class TTSResponse(BaseModel):
 
 def get_model():
     """Get or load the TTS model (cached)"""
-    if "model" not in MODEL_CACHE:
-        print(f"Loading Chatterbox-Turbo on {DEVICE}...")
-        MODEL_CACHE["model"] = ChatterboxTurboTTS.from_pretrained(DEVICE)
-    return MODEL_CACHE["model"]
+    model = MODEL_CACHE.get("model")
+    if model is not None:
+        return model
+    # Double-checked so concurrent cold-start callers never load a second copy
+    with MODEL_LOCK:
+        model = MODEL_CACHE.get("model")
+        if model is None:
+            print(f"Loading Chatterbox-Turbo on {DEVICE}...")
+            model = ChatterboxTurboTTS.from_pretrained(DEVICE)
+            freeze_model(model)
+            WAV_HEADERS["X-Sample-Rate"] = STREAM_HEADERS["X-Sample-Rate"] = str(model.sr)
+            MODEL_CACHE["model"] = model
+    return model
+
+def freeze_model(model):
+    """Mark every submodule's parameters (t3, s3gen, ve, ...) as not requiring grad"""
+    for module in vars(model).values():
+        if isinstance(module, torch.nn.Module):
+            module.requires_grad_(False)
+
+@contextmanager
+def inference_context():
+    """Disable autograd tracking and enable autocast (if configured) for generation"""
+    with torch.inference_mode(), torch.autocast(device_type=DEVICE, dtype=AUTOCAST_DTYPE, enabled=USE_AUTOCAST):
+        yield
+
+def compile_model(model):
+    """Compile the T3 transformer backbone, which the autoregressive loop calls once per token,
+    and the S3Gen decoder hot paths (flow-matching estimator forward + HiFiGAN decode) that turn tokens into audio"""
+    try:
+        # The KV cache grows by one position per step, so every call has a new sequence length:
+        # dynamic shapes keep that from recompiling until dynamo's limit drops it back to eager
+        model.t3.tfmr = torch.compile(model.t3.tfmr, mode="reduce-overhead", dynamic=True, fullgraph=False)
+    except Exception as e:
+        print(f"torch.compile unavailable, running eager: {e}")
+        return
+    # Decoder inputs scale with the output length, so compile with dynamic shapes
+    # (and without CUDA graphs, which would be re-recorded for every new length).
+    # S3Gen calls estimator.forward / mel2wav.inference -> self.decode rather than the modules
+    # themselves, so wrapping the modules would be bypassed: compile the bound methods instead.
+    try:
+        estimator = model.s3gen.flow.decoder.estimator
+        estimator.forward = torch.compile(estimator.forward, dynamic=True)
+        mel2wav = model.s3gen.mel2wav
+        mel2wav.decode = torch.compile(mel2wav.decode, dynamic=True)
+    except Exception as e:
+        print(f"Decoder compile skipped, running eager: {e}")
+
+def warmup_model(model):
+    """Run one short generation so kernel selection/compilation and allocator
+    arena reservation happen before the first real request"""
+    audio_prompt_path = next(iter(AVAILABLE_VOICES.values()), None)
+    try:
+        run_generate(model, text="Warm up.", audio_prompt_path=audio_prompt_path)
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+    except Exception as e:
+        print(f"Model warmup skipped: {e}")
+
+async def load_model():
+    """Load, optionally compile, and warm up the model before serving requests"""
+    if torch.cuda.is_available():
+        # Let cuDNN autotune conv algorithms (warmup pays the cost) and allow TF32 matmuls
+        torch.backends.cudnn.benchmark = True
+        torch.set_float32_matmul_precision("high")
+    model = await asyncio.to_thread(get_model)
+    if USE_COMPILE:
+        compile_model(model)
+    await asyncio.to_thread(warmup_model, model)
+    if PREWARM_VOICES:
+        await asyncio.to_thread(prewarm_voices, model)
+
+def prewarm_voices(model):
+    """Fill CONDITIONALS_CACHE with the server-side voices (default norm_loudness)"""
+    for path in sorted(set(AVAILABLE_VOICES.values()))[:CONDITIONALS_CACHE_SIZE]:
+        voice_key = path_voice_key(path)
+        if not voice_key:
+            continue
+        try:
+            with inference_context():
+                apply_conditionals(model, path, voice_key, True)
+        except Exception as e:
+            print(f"Voice prewarm skipped for {Path(path).name}: {e}")
+
+def path_voice_key(path: str) -> Optional[str]:
+    """Conditionals cache key for a reference clip on disk; changes when the file is replaced"""
+    try:
+        return f"{path}:{os.stat(path).st_mtime_ns}"
+    except OSError:
+        return None
+
+def apply_conditionals(model, audio_prompt_path: str, voice_key: str, norm_loudness: bool):
+    """Set model.conds for a reference clip, preparing them only on a cache miss"""
+    key = (voice_key, norm_loudness)
+    with CONDITIONALS_LOCK:
+        conds = CONDITIONALS_CACHE.get(key)
+        if conds is not None:
+            CONDITIONALS_CACHE.move_to_end(key)
+    if conds is None:
+        model.prepare_conditionals(audio_prompt_path, norm_loudness=norm_loudness)
+        with CONDITIONALS_LOCK:
+            CONDITIONALS_CACHE[key] = model.conds
+            while len(CONDITIONALS_CACHE) > CONDITIONALS_CACHE_SIZE:
+                CONDITIONALS_CACHE.popitem(last=False)
+    else:
+        model.conds = conds
+
+def run_generate(model, seed: Optional[int] = None, voice_key: Optional[str] = None, **kwargs) -> torch.Tensor:
+    """Seed (if requested) and run model.generate under inference_context.
+    The reference clip's conditionals come from CONDITIONALS_CACHE, keyed by voice_key
+    (content hash of an upload) or else by the file's path and mtime.
+    Blocking - call via asyncio.to_thread while holding GPU_SEMAPHORE.
+    Holds GENERATE_LOCK so another thread can't swap model.conds mid-generation.
+    """
+    with GENERATE_LOCK, inference_context():
+        if seed:
+            set_seed(seed)
+        audio_prompt_path = kwargs.get("audio_prompt_path")
+        if audio_prompt_path:
+            voice_key = voice_key or path_voice_key(audio_prompt_path)
+            if voice_key:
+                apply_conditionals(model, audio_prompt_path, voice_key, kwargs.get("norm_loudness", True))
+                kwargs["audio_prompt_path"] = None
+        return model.generate(**kwargs)
+
+async def generate_audio(model, **kwargs) -> torch.Tensor:
+    """Run run_generate in a worker thread while holding GPU_SEMAPHORE.
+    If the caller is cancelled (e.g. a streaming client disconnects), the
+    semaphore is only released once the thread has actually finished.
+    """
+    global GENERATIONS_RUNNING, GENERATIONS_WAITING
+    GENERATIONS_WAITING += 1
+    try:
+        await GPU_SEMAPHORE.acquire()
+    finally:
+        GENERATIONS_WAITING -= 1
+    GENERATIONS_RUNNING += 1
+    try:
+        task = asyncio.ensure_future(asyncio.to_thread(run_generate, model, **kwargs))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            await asyncio.wait([task])
+            raise
+        finally:
+            if EMPTY_CACHE_AFTER_REQUEST:
+                await asyncio.to_thread(release_cuda_memory)
+    finally:
+        GENERATIONS_RUNNING -= 1
+        GPU_SEMAPHORE.release()
+
+def release_cuda_memory():
+    """Drop unreachable tensors and return the caching allocator's free blocks to the driver"""
+    gc.collect()
+    torch.cuda.empty_cache()
+    torch.cuda.ipc_collect()
 
 def set_seed(seed: int):
     """Set random seed for reproducibility"""
+    # torch.manual_seed already seeds the CUDA generators of every device
     torch.manual_seed(seed)
-    if torch.cuda.is_available():
-        torch.cuda.manual_seed(seed)
-        torch.cuda.manual_seed_all(seed)
     random.seed(seed)
-    np.random.seed(seed)
+    # numpy only accepts seeds in [0, 2**32)
+    np.random.seed(seed & 0xFFFFFFFF)
+
+def get_scratch(n: int, dtype) -> np.ndarray:
+    """Return a length-n view of this thread's scratch array for dtype, growing it if needed.
+    The view is only valid until the next call on the same thread.
+    """
+    name = np.dtype(dtype).name
+    buf = getattr(AUDIO_SCRATCH, name, None)
+    if buf is None or buf.size < n:
+        buf = np.empty(max(n, AUDIO_SCRATCH_MIN_SAMPLES), dtype=dtype)
+        setattr(AUDIO_SCRATCH, name, buf)
+    return buf[:n]
 
 def process_audio(wav: torch.Tensor, sample_rate: int) -> np.ndarray:
-    """Process audio tensor to numpy array for saving"""
+    """Process audio tensor to numpy array for saving.
+    Returns a view of this thread's float32 scratch (the input is never modified) - consume it
+    before the next call.
+    """
+    # Fast path for the usual model output: contiguous mono float32 on CPU, (T,) or (1, T).
+    # Clip the zero-copy view straight into scratch rather than in place, which would write
+    # into the caller's tensor
+    if (
+        isinstance(wav, torch.Tensor)
+        and wav.dtype == torch.float32
+        and wav.device.type == "cpu"
+        and (wav.ndim == 1 or (wav.ndim == 2 and wav.shape[0] == 1))
+        and wav.is_contiguous()
+    ):
+        wav = wav.detach().numpy().reshape(-1)
+        return np.clip(wav, -1.0, 1.0, out=get_scratch(wav.size, np.float32))
+    
     if isinstance(wav, torch.Tensor):
-        wav = wav.cpu().numpy()
+        wav = wav.detach()
+        if wav.dtype == torch.float32 and wav.device.type == "cpu":
+            # Zero-copy view of the model output
+            wav = wav.numpy()
+        else:
+            # Convert dtype/device straight into reused scratch instead of a fresh array
+            out = get_scratch(wav.numel(), np.float32).reshape(wav.shape)
+            torch.from_numpy(out).copy_(wav)
+            wav = out
+    else:
+        wav = np.asarray(wav, dtype=np.float32)
     
-    # Ensure correct shape
-    if wav.ndim > 1:
+    # Ensure correct shape: mono output ((1, T), (T, 1) or (T,)) flattens to a (T,) view;
+    # only genuine multi-channel audio is laid out as contiguous (frames, channels)
+    if wav.ndim == 2 and min(wav.shape) > 1:
         if wav.shape[0] < wav.shape[1]:
-            wav = wav.T
-        if wav.shape[0] == 1:
-            wav = wav.squeeze(0)
-        elif wav.ndim == 2 and wav.shape[1] == 1:
-            wav = wav.squeeze(1)
+            wav = np.ascontiguousarray(wav.T)
+    else:
+        wav = wav.reshape(-1)
     
-    # Ensure float32 and normalize
-    if wav.dtype != 'float32':
-        wav = wav.astype('float32')
-    wav = np.clip(wav, -1.0, 1.0)
+    # Clip into scratch (in place when wav already is the scratch), never into the caller's tensor
+    return np.clip(wav, -1.0, 1.0, out=get_scratch(wav.size, np.float32).reshape(wav.shape))
+
+def quantize_pcm16(wav: np.ndarray) -> np.ndarray:
+    """Convert clipped float32 audio in [-1, 1] to int16 PCM samples.
+    Scales and rounds in place (wav must be scratch, as returned by process_audio) and casts into
+    this thread's int16 scratch, so steady-state encoding allocates nothing.
+    """
+    np.multiply(wav, 32767.0, out=wav)
+    np.rint(wav, out=wav)
+    pcm = get_scratch(wav.size, np.int16).reshape(wav.shape)
+    np.copyto(pcm, wav, casting='unsafe')
+    return pcm
+
+@contextmanager
+def pinned_pcm16(n: int):
+    """Borrow a pinned int16 host buffer of n samples from PINNED_PCM16_POOL.
+    Allocates when the pool is empty; at most TTS_CONCURRENCY buffers are kept afterwards.
+    """
+    try:
+        buffer = PINNED_PCM16_POOL.get_nowait()
+    except queue.Empty:
+        buffer = None
+    if buffer is None or buffer.numel() < n:
+        buffer = torch.empty(n, dtype=torch.int16, pin_memory=True)
+    try:
+        yield buffer[:n]
+    finally:
+        with suppress(queue.Full):
+            PINNED_PCM16_POOL.put_nowait(buffer)
+
+@contextmanager
+def quantize_pcm16_cuda(wav: torch.Tensor):
+    """Quantize mono CUDA audio to int16 on the device, then copy it into a
+    pooled pinned host buffer - half the bytes of a float32 pageable copy.
+    The yielded array is only valid inside the with block.
+    """
+    pcm = wav.detach().reshape(-1).float().clamp(-1.0, 1.0).mul_(32767.0).round_().to(torch.int16)
+    with pinned_pcm16(pcm.numel()) as host:
+        host.copy_(pcm, non_blocking=True)
+        torch.cuda.current_stream(pcm.device).synchronize()
+        yield host.numpy()
+
+def wav_header(n_frames: Optional[int], sample_rate: int, n_channels: int = 1) -> bytes:
+    """Build the 44-byte RIFF/WAVE header for 16-bit PCM data.
+    n_frames=None marks a stream of unknown length (sizes set to the 0xFFFFFFFF maximum).
+    """
+    if n_frames is None:
+        riff_size = data_size = 0xFFFFFFFF
+    else:
+        data_size = n_frames * n_channels * 2
+        riff_size = 36 + data_size
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', riff_size, b'WAVE',
+        b'fmt ', 16, 1, n_channels, sample_rate, sample_rate * n_channels * 2, n_channels * 2, 16,
+        b'data', data_size,
+    )
+
+@contextmanager
+def to_pcm16(wav: torch.Tensor, sample_rate: int):
+    """Process model output into int16 PCM samples, yielding a view of a scratch or pinned
+    buffer that is only valid inside the with block"""
+    if isinstance(wav, torch.Tensor) and wav.is_cuda and wav.numel() == max(wav.shape, default=1):
+        with quantize_pcm16_cuda(wav) as pcm:
+            yield pcm
+    else:
+        yield quantize_pcm16(process_audio(wav, sample_rate))
+
+def encode_pcm16_bytes(wav: torch.Tensor, sample_rate: int) -> bytes:
+    """Process model output into raw int16 PCM bytes for a streamed WAV body.
+    Blocking (numpy) - call via asyncio.to_thread from async handlers.
+    """
+    # Copied out: the scratch view may be reused before the chunk is sent
+    with to_pcm16(wav, sample_rate) as pcm:
+        return pcm.tobytes()
+
+def encode_wav(wav: torch.Tensor, sample_rate: int) -> bytes:
+    """Process audio and encode it into an in-memory 16-bit PCM WAV file.
+    Blocking (numpy) - call via asyncio.to_thread from async handlers.
+    """
+    with to_pcm16(wav, sample_rate) as pcm:
+        # A PCM16 WAV is just the header followed by the raw little-endian samples;
+        # join copies the samples straight from the array's memory, without tobytes()
+        return b"".join((wav_header(pcm.shape[0], sample_rate, 1 if pcm.ndim == 1 else pcm.shape[1]), pcm.data))
+
+async def save_upload(audio_file: UploadFile) -> tuple[str, str]:
+    """Stream an uploaded file to a temporary file in fixed-size chunks.
+    Keeps memory per request bounded by UPLOAD_CHUNK_SIZE instead of the file size.
+    Returns the temporary file path and a content hash of the upload;
+    the caller is responsible for deleting the file.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    tmp_file = tempfile.NamedTemporaryFile(
+        delete=False, prefix=UPLOAD_PREFIX, suffix=Path(audio_file.filename).suffix, dir=UPLOAD_DIR
+    )
+    try:
+        with tmp_file:
+            while chunk := await audio_file.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                tmp_file.write(chunk)
+    except BaseException:
+        os.unlink(tmp_file.name)
+        raise
+    return tmp_file.name, digest.hexdigest()
+
+def remove_upload(path: str):
+    """Delete a file written by save_upload (never called for voice/ files).
+    It was created by us, so unlink directly instead of stat-ing first.
+    """
+    with suppress(FileNotFoundError):
+        os.unlink(path)
+
+# Web UI is a static page served by StaticFiles (with ETag/Last-Modified
+# revalidation), bypassing route handling and dependency injection
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles (ETag/Last-Modified + 304s) that also lets browsers reuse files without revalidating"""
     
-    return wav
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers.setdefault("Cache-Control", STATIC_CACHE_CONTROL)
+        return response
+
+app.mount("/ui", CachedStaticFiles(directory=STATIC_DIR, html=True), name="ui")
 
-@app.get("/", response_class=HTMLResponse)
+@app.get("/", include_in_schema=False)
 async def read_root():
-    """Serve the web UI"""
-    html_content = """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Chatterbox Turbo TTS</title>
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif;
-            background: #f5f5f5;
-            height: 100vh;
-            padding: 15px;
-            overflow: hidden;
-        }
-        .header {
-            background: #ffffff;
-            color: #000000;
-            border: 2px solid #000000;
-            padding: 15px;
-            text-align: center;
-            margin-bottom: 15px;
-            border-radius: 8px;
-        }
-        .header h1 { font-size: 1.6em; }
-        .grid-container {
-            display: grid;
-            grid-template-columns: 1fr 1fr;
-            grid-template-rows: 1fr 1fr;
-            gap: 15px;
-            max-width: 1400px;
-            margin: 0 auto;
-            height: calc(100vh - 90px);
-        }
-        .box {
-            background: white;
-            border: 2px solid #e0e0e0;
-            border-radius: 8px;
-            padding: 15px;
-            display: flex;
-            flex-direction: column;
-            overflow: hidden;
-            min-height: 0;
-        }
-        .box h2 {
-            font-size: 1.1em;
-            margin-bottom: 10px;
-            color: #333;
-            border-bottom: 2px solid #000;
-            padding-bottom: 6px;
-            flex-shrink: 0;
-        }
-        .form-group {
-            margin-bottom: 12px;
-            flex-shrink: 0;
-        }
-        label {
-            display: block;
-            margin-bottom: 6px;
-            font-weight: 600;
-            color: #333;
-            font-size: 0.9em;
-        }
-        textarea {
-            width: 100%;
-            flex: 1;
-            min-height: 100px;
-            padding: 10px;
-            border: 2px solid #e0e0e0;
-            border-radius: 6px;
-            font-size: 14px;
-            font-family: inherit;
-            resize: none;
-        }
-        textarea:focus {
-            outline: none;
-            border-color: #000000;
-        }
-        .tags-container {
-            display: flex;
-            flex-wrap: wrap;
-            gap: 3px;
-            margin-top: 6px;
-            max-height: 60px;
-            overflow-y: auto;
-            width: 100%;
-            align-items: flex-start;
-        }
-        .tag-btn {
-            padding: 2px 6px;
-            background: #ffffff;
-            border: 1px solid #000000;
-            color: #000000;
-            border-radius: 3px;
-            cursor: pointer;
-            font-size: 9px;
-            transition: all 0.2s;
-            white-space: nowrap;
-            flex: 0 0 auto;
-            width: auto;
-            max-width: none;
-            display: inline-block;
-        }
-        .tag-btn:hover {
-            background: #000000;
-            color: #ffffff;
-        }
-        input[type="file"] {
-            width: 100%;
-            padding: 8px;
-            border: 2px dashed #e0e0e0;
-            border-radius: 6px;
-            cursor: pointer;
-            font-size: 0.85em;
-        }
-        select {
-            width: 100%;
-            padding: 8px;
-            border: 2px solid #e0e0e0;
-            border-radius: 6px;
-            font-size: 0.9em;
-            font-family: inherit;
-            background: white;
-            cursor: pointer;
-        }
-        select:focus {
-            outline: none;
-            border-color: #000000;
-        }
-        .voice-info {
-            font-size: 0.75em;
-            color: #666;
-            margin-top: 4px;
-        }
-        .slider-group {
-            display: grid;
-            grid-template-columns: 1fr 1fr;
-            gap: 10px;
-            margin-top: 8px;
-        }
-        .slider-item {
-            display: flex;
-            flex-direction: column;
-        }
-        .slider-item label {
-            margin-bottom: 3px;
-            font-size: 0.8em;
-        }
-        input[type="range"] {
-            width: 100%;
-            margin: 4px 0;
-        }
-        .slider-value {
-            font-size: 0.8em;
-            color: #666;
-            margin-top: 2px;
-        }
-        input[type="number"] {
-            width: 100%;
-            padding: 6px;
-            border: 2px solid #e0e0e0;
-            border-radius: 6px;
-            font-size: 0.9em;
-        }
-        input[type="checkbox"] {
-            width: 18px;
-            height: 18px;
-            cursor: pointer;
-        }
-        .checkbox-group {
-            display: flex;
-            align-items: center;
-            gap: 8px;
-            font-size: 0.9em;
-        }
-        button {
-            background: #ffffff;
-            color: #000000;
-            border: 2px solid #000000;
-            padding: 12px 20px;
-            font-size: 1em;
-            font-weight: 600;
-            border-radius: 6px;
-            cursor: pointer;
-            width: 100%;
-            margin-top: 10px;
-            transition: all 0.2s;
-        }
-        button:hover {
-            background: #f5f5f5;
-        }
-        button:disabled {
-            opacity: 0.6;
-            cursor: not-allowed;
-        }
-        .audio-output {
-            flex: 1;
-            display: flex;
-            flex-direction: column;
-            overflow: hidden;
-        }
-        .audio-output h3 {
-            margin-bottom: 10px;
-            font-size: 1em;
-        }
-        audio {
-            width: 100%;
-            margin-top: 8px;
-        }
-        .loading {
-            display: none;
-            text-align: center;
-            padding: 15px;
-        }
-        .loading.active {
-            display: block;
-        }
-        .spinner {
-            border: 3px solid #f3f3f3;
-            border-top: 3px solid #000000;
-            border-radius: 50%;
-            width: 30px;
-            height: 30px;
-            animation: spin 1s linear infinite;
-            margin: 0 auto;
-        }
-        @keyframes spin {
-            0% { transform: rotate(0deg); }
-            100% { transform: rotate(360deg); }
-        }
-        .error {
-            background: #f5f5f5;
-            color: #000000;
-            border: 1px solid #000000;
-            padding: 10px;
-            border-radius: 6px;
-            margin-top: 10px;
-            display: none;
-            font-size: 0.85em;
-        }
-        .error.active {
-            display: block;
-        }
-        .scrollable {
-            overflow-y: auto;
-            flex: 1;
-            min-height: 0;
-        }
-        .download-link {
-            margin-top: 8px;
-            color: #000;
-            text-decoration: none;
-            font-size: 0.9em;
-            display: inline-block;
-        }
-        .download-link:hover {
-            text-decoration: underline;
-        }
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>Chatterbox Turbo TTS</h1>
-    </div>
+    """Redirect to the web UI"""
+    return RedirectResponse("/ui/", status_code=308)
+
+def audio_cache_key(request: TTSRequest, voice_key: Optional[str]) -> Optional[tuple]:
+    """AUDIO_CACHE key, or None when the output isn't repeatable (unseeded, or no known voice)"""
+    if not AUDIO_CACHE_SIZE or not request.seed or not voice_key:
+        return None
+    return (
+        voice_key, request.text, request.seed, request.temperature, request.top_p,
+        request.top_k, request.repetition_penalty, request.min_p, request.norm_loudness,
+    )
+
+async def wav_response(model, request: TTSRequest, audio_prompt_path: Optional[str], voice_key: Optional[str] = None):
+    """Generate the full WAV for a request (or reuse it from AUDIO_CACHE) and wrap it in a response"""
+    cache_key = None
+    if AUDIO_CACHE_SIZE and request.seed and audio_prompt_path:
+        voice_key = voice_key or await asyncio.to_thread(path_voice_key, audio_prompt_path)
+        cache_key = audio_cache_key(request, voice_key)
+        cached = AUDIO_CACHE.get(cache_key)
+        if cached is not None:
+            AUDIO_CACHE.move_to_end(cache_key)
+            return Response(cached, media_type="audio/wav", headers=WAV_HEADERS)
     
-    <div class="grid-container">
-        <!-- Box 1: Text Input -->
-        <div class="box">
-            <h2>Text Input</h2>
-            <form id="ttsForm">
-                <div class="form-group" style="flex: 1; display: flex; flex-direction: column;">
-                    <label for="text">Text to Synthesize</label>
-                    <textarea id="text" name="text" placeholder="Enter your text here... You can use paralinguistic tags like [cough], [laugh], [chuckle], etc.">Hi there [clear throat]..., this is Chris... Do you have a sec? [sniff] ... I really need 400 row-bucks [cough] ... added to my row-blocks account.</textarea>
-                </div>
-                <div class="form-group" style="flex-shrink: 0;">
-                    <label style="font-size: 0.85em;">Paralinguistic Tags</label>
-                    <div class="tags-container" id="tagsContainer"></div>
-                </div>
-                <button type="submit" id="generateBtn">Generate</button>
-            </form>
-        </div>
-        
-        <!-- Box 2: Voice Selection -->
-        <div class="box">
-            <h2>Voice Selection</h2>
-            <div class="scrollable">
-                <div class="form-group">
-                    <label for="voiceSelect">Server-Side Voice</label>
-                    <select id="voiceSelect" name="voiceSelect">
-                        <option value="">Loading voices...</option>
-                    </select>
-                    <div class="voice-info">Select a voice for faster generation</div>
-                </div>
-                
-                <div class="form-group">
-                    <label for="audioFile">Or Upload Custom Audio</label>
-                    <input type="file" id="audioFile" name="audioFile" accept="audio/*">
-                </div>
-                
-                <div class="loading" id="loading">
-                    <div class="spinner"></div>
-                    <p style="margin-top: 8px; font-size: 0.9em;">Generating...</p>
-                </div>
-                
-                <div class="error" id="error"></div>
-            </div>
-        </div>
-        
-        <!-- Box 3: Settings -->
-        <div class="box">
-            <h2>Settings</h2>
-            <div class="scrollable">
-                <div class="slider-group">
-                    <div class="slider-item">
-                        <label for="temperature">Temperature: <span class="slider-value" id="tempValue">0.8</span></label>
-                        <input type="range" id="temperature" name="temperature" min="0.05" max="2.0" step="0.05" value="0.8">
-                    </div>
-                    <div class="slider-item">
-                        <label for="top_p">Top P: <span class="slider-value" id="topPValue">0.95</span></label>
-                        <input type="range" id="top_p" name="top_p" min="0.0" max="1.0" step="0.01" value="0.95">
-                    </div>
-                    <div class="slider-item">
-                        <label for="top_k">Top K: <span class="slider-value" id="topKValue">1000</span></label>
-                        <input type="range" id="top_k" name="top_k" min="0" max="1000" step="10" value="1000">
-                    </div>
-                    <div class="slider-item">
-                        <label for="repetition_penalty">Repetition Penalty: <span class="slider-value" id="repPenValue">1.2</span></label>
-                        <input type="range" id="repetition_penalty" name="repetition_penalty" min="1.0" max="2.0" step="0.05" value="1.2">
-                    </div>
-                    <div class="slider-item">
-                        <label for="min_p">Min P: <span class="slider-value" id="minPValue">0.0</span></label>
-                        <input type="range" id="min_p" name="min_p" min="0.0" max="1.0" step="0.01" value="0.0">
-                    </div>
-                    <div class="slider-item">
-                        <label for="seed">Seed: <span class="slider-value" id="seedValue">0</span></label>
-                        <input type="number" id="seed" name="seed" value="0" min="0">
-                    </div>
-                </div>
-                <div class="checkbox-group" style="margin-top: 8px;">
-                    <input type="checkbox" id="norm_loudness" name="norm_loudness" checked>
-                    <label for="norm_loudness" style="margin: 0; font-size: 0.85em;">Normalize Loudness (-27 LUFS)</label>
-                </div>
-            </div>
-        </div>
-        
-        <!-- Box 4: Output -->
-        <div class="box">
-            <h2>Output</h2>
-            <div class="audio-output" id="audioOutput" style="display: none;">
-                <audio id="audioPlayer" controls></audio>
-                <a id="downloadLink" href="#" download="output.wav" class="download-link">Download Audio</a>
-            </div>
-            <div id="noOutput" style="text-align: center; color: #999; padding: 40px 0; font-size: 0.9em;">
-                Generated audio will appear here
-            </div>
-        </div>
-    </div>
+    wav = await generate_audio(
+        model,
+        seed=request.seed,
+        voice_key=voice_key,
+        text=request.text,
+        audio_prompt_path=audio_prompt_path,
+        temperature=request.temperature,
+        top_p=request.top_p,
+        top_k=request.top_k,
+        repetition_penalty=request.repetition_penalty,
+        min_p=request.min_p,
+        norm_loudness=request.norm_loudness,
+    )
     
-    <script>
-        // Load available voices
-        async function loadVoices() {
-            try {
-                const response = await fetch('/api/voices');
-                if (!response.ok) {
-                    throw new Error(`HTTP error! status: ${response.status}`);
-                }
-                const data = await response.json();
-                const voiceSelect = document.getElementById('voiceSelect');
-                
-                if (data.voices && data.voices.length > 0) {
-                    voiceSelect.innerHTML = '<option value="">None (use uploaded file)</option>';
-                    data.voices.forEach((voice, index) => {
-                        const option = document.createElement('option');
-                        option.value = voice;
-                        option.textContent = voice;
-                        // Select the first voice by default
-                        if (index === 0) {
-                            option.selected = true;
-                        }
-                        voiceSelect.appendChild(option);
-                    });
-                } else {
-                    voiceSelect.innerHTML = '<option value="">No voices available</option>';
-                }
-            } catch (err) {
-                console.error('Failed to load voices:', err);
-                const voiceSelect = document.getElementById('voiceSelect');
-                voiceSelect.innerHTML = '<option value="">Error loading voices - check console</option>';
-            }
-        }
-        
-        // Load voices on page load
-        loadVoices();
-        
-        // Initialize paralinguistic tags
-        const tags = ["[clear throat]", "[sigh]", "[shush]", "[cough]", "[groan]", "[sniff]", "[gasp]", "[chuckle]", "[laugh]"];
-        const tagsContainer = document.getElementById('tagsContainer');
-        tags.forEach(tag => {
-            const btn = document.createElement('button');
-            btn.type = 'button';
-            btn.className = 'tag-btn';
-            btn.textContent = tag;
-            btn.onclick = () => insertTag(tag);
-            tagsContainer.appendChild(btn);
-        });
-        
-        function insertTag(tag) {
-            const textarea = document.getElementById('text');
-            const start = textarea.selectionStart;
-            const end = textarea.selectionEnd;
-            const text = textarea.value;
-            const prefix = (start === 0 || text[start - 1] === ' ') ? '' : ' ';
-            const suffix = (end < text.length && text[end] === ' ') ? '' : ' ';
-            textarea.value = text.slice(0, start) + prefix + tag + suffix + text.slice(end);
-            textarea.focus();
-            textarea.setSelectionRange(start + prefix.length + tag.length, start + prefix.length + tag.length);
-        }
-        
-        // Update slider values
-        document.getElementById('temperature').addEventListener('input', (e) => {
-            document.getElementById('tempValue').textContent = e.target.value;
-        });
-        document.getElementById('top_p').addEventListener('input', (e) => {
-            document.getElementById('topPValue').textContent = e.target.value;
-        });
-        document.getElementById('top_k').addEventListener('input', (e) => {
-            document.getElementById('topKValue').textContent = e.target.value;
-        });
-        document.getElementById('repetition_penalty').addEventListener('input', (e) => {
-            document.getElementById('repPenValue').textContent = e.target.value;
-        });
-        document.getElementById('min_p').addEventListener('input', (e) => {
-            document.getElementById('minPValue').textContent = e.target.value;
-        });
-        document.getElementById('seed').addEventListener('input', (e) => {
-            document.getElementById('seedValue').textContent = e.target.value;
-        });
-        
-        
-        // Form submission
-        document.getElementById('ttsForm').addEventListener('submit', async (e) => {
-            e.preventDefault();
-            const formData = new FormData(e.target);
-            const audioFile = document.getElementById('audioFile').files[0];
-            
-            const loading = document.getElementById('loading');
-            const error = document.getElementById('error');
-            const audioOutput = document.getElementById('audioOutput');
-            const generateBtn = document.getElementById('generateBtn');
-            
-            loading.classList.add('active');
-            error.classList.remove('active');
-            audioOutput.style.display = 'none';
-            generateBtn.disabled = true;
-            
-            try {
-                let response;
-                let voiceName = document.getElementById('voiceSelect').value;
-                
-                // If no voice selected and no file uploaded, use first available voice
-                if (!voiceName && !audioFile) {
-                    const voiceSelect = document.getElementById('voiceSelect');
-                    const firstVoiceOption = voiceSelect.querySelector('option[value]:not([value=""])');
-                    if (firstVoiceOption) {
-                        voiceName = firstVoiceOption.value;
-                    }
-                }
-                
-                if (audioFile) {
-                    // Use upload endpoint (uploaded file takes priority)
-                    const uploadData = new FormData();
-                    uploadData.append('text', formData.get('text'));
-                    uploadData.append('audio_file', audioFile);
-                    uploadData.append('temperature', parseFloat(formData.get('temperature') || '0.8').toString());
-                    uploadData.append('top_p', parseFloat(formData.get('top_p') || '0.95').toString());
-                    uploadData.append('top_k', parseInt(formData.get('top_k') || '1000').toString());
-                    uploadData.append('repetition_penalty', parseFloat(formData.get('repetition_penalty') || '1.2').toString());
-                    uploadData.append('min_p', parseFloat(formData.get('min_p') || '0.0').toString());
-                    const normLoudness = formData.get('norm_loudness');
-                    uploadData.append('norm_loudness', normLoudness === 'on' || normLoudness === 'true' ? 'true' : 'false');
-                    const seed = formData.get('seed');
-                    if (seed && seed !== '0') uploadData.append('seed', parseInt(seed).toString());
-                    
-                    response = await fetch('/api/tts/upload', {
-                        method: 'POST',
-                        body: uploadData
-                    });
-                } else if (voiceName) {
-                    // Use upload endpoint with voice_name (no file upload)
-                    const uploadData = new FormData();
-                    uploadData.append('text', formData.get('text'));
-                    uploadData.append('voice_name', voiceName);
-                    uploadData.append('temperature', parseFloat(formData.get('temperature') || '0.8').toString());
-                    uploadData.append('top_p', parseFloat(formData.get('top_p') || '0.95').toString());
-                    uploadData.append('top_k', parseInt(formData.get('top_k') || '1000').toString());
-                    uploadData.append('repetition_penalty', parseFloat(formData.get('repetition_penalty') || '1.2').toString());
-                    uploadData.append('min_p', parseFloat(formData.get('min_p') || '0.0').toString());
-                    const normLoudness = formData.get('norm_loudness');
-                    uploadData.append('norm_loudness', normLoudness === 'on' || normLoudness === 'true' ? 'true' : 'false');
-                    const seed = formData.get('seed');
-                    if (seed && seed !== '0') uploadData.append('seed', parseInt(seed).toString());
-                    
-                    response = await fetch('/api/tts/upload', {
-                        method: 'POST',
-                        body: uploadData
-                    });
-                } else {
-                    // Use JSON endpoint (no voice specified)
-                    const jsonData = {
-                        text: formData.get('text'),
-                        temperature: parseFloat(formData.get('temperature')),
-                        top_p: parseFloat(formData.get('top_p')),
-                        top_k: parseInt(formData.get('top_k')),
-                        repetition_penalty: parseFloat(formData.get('repetition_penalty')),
-                        min_p: parseFloat(formData.get('min_p')),
-                        norm_loudness: formData.get('norm_loudness') === 'on',
-                    };
-                    const seed = formData.get('seed');
-                    if (seed && seed !== '0') jsonData.seed = parseInt(seed);
-                    if (voiceName) jsonData.voice_name = voiceName;
-                    
-                    response = await fetch('/api/tts', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify(jsonData)
-                    });
-                }
-                
-                if (!response.ok) {
-                    let errorMessage = 'Generation failed';
-                    try {
-                        const errorData = await response.json();
-                        // FastAPI validation errors (422) return detail as array
-                        if (Array.isArray(errorData.detail)) {
-                            errorMessage = errorData.detail.map(e => e.msg || e.loc?.join('.') || JSON.stringify(e)).join(', ');
-                        } else if (errorData.detail) {
-                            errorMessage = typeof errorData.detail === 'string' ? errorData.detail : JSON.stringify(errorData.detail);
-                        } else if (errorData.message) {
-                            errorMessage = errorData.message;
-                        }
-                    } catch (parseErr) {
-                        errorMessage = `HTTP ${response.status}: ${response.statusText}`;
-                    }
-                    throw new Error(errorMessage);
-                }
-                
-                const blob = await response.blob();
-                const url = URL.createObjectURL(blob);
-                document.getElementById('audioPlayer').src = url;
-                document.getElementById('downloadLink').href = url;
-                document.getElementById('downloadLink').download = 'output.wav';
-                document.getElementById('noOutput').style.display = 'none';
-                audioOutput.style.display = 'block';
-            } catch (err) {
-                error.textContent = 'Error: ' + (err.message || String(err));
-                error.classList.add('active');
-            } finally {
-                loading.classList.remove('active');
-                generateBtn.disabled = false;
-            }
-        });
-    </script>
-</body>
-</html>
+    # Process and encode audio off the event loop
+    wav_bytes = await asyncio.to_thread(encode_wav, wav, model.sr)
+    if cache_key:
+        AUDIO_CACHE[cache_key] = wav_bytes
+        while len(AUDIO_CACHE) > AUDIO_CACHE_SIZE:
+            AUDIO_CACHE.popitem(last=False)
+    
+    # The body is complete, so send it in one write (Response sets Content-Length)
+    return Response(wav_bytes, media_type="audio/wav", headers=WAV_HEADERS)
+
+async def admission_control():
+    """Fail fast with 503 when the generation queue is full, instead of slowing every queued request.
+    The slot is reserved here, before the body/upload is processed, and released when the request ends
+    (for streams, after the body is sent - which needs FastAPI >= 0.118, see requirements_web.txt).
     """
-    return html_content
+    global TTS_REQUESTS_ADMITTED
+    if MAX_QUEUED_GENERATIONS and TTS_REQUESTS_ADMITTED >= TTS_CONCURRENCY + MAX_QUEUED_GENERATIONS:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server busy, retry in {RETRY_AFTER_SECONDS}s",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    TTS_REQUESTS_ADMITTED += 1
+    try:
+        yield
+    finally:
+        TTS_REQUESTS_ADMITTED -= 1
 
-@app.post("/api/tts")
-async def generate_tts(request: TTSRequest):
+@app.post("/api/tts", dependencies=[Depends(admission_control)])
+async def generate_tts(
+    request: TTSRequest,
+    stream: bool = Query(False, description="Stream the audio sentence by sentence (same as /api/tts/stream)"),
+):
     """Generate TTS audio from text (JSON API)"""
     try:
         model = get_model()
         
-        if request.seed is not None and request.seed != 0:
-            set_seed(request.seed)
-        
         # Resolve voice path (voice_name takes priority over audio_prompt_path)
-        audio_prompt_path = resolve_voice_path(request.voice_name, request.audio_prompt_path)
-        
-        wav = model.generate(
-            text=request.text,
-            audio_prompt_path=audio_prompt_path,
-            temperature=request.temperature,
-            top_p=request.top_p,
-            top_k=request.top_k,
-            repetition_penalty=request.repetition_penalty,
-            min_p=request.min_p,
-            norm_loudness=request.norm_loudness,
-        )
-        
-        # Process audio
-        wav_np = process_audio(wav, model.sr)
-        
-        # Create in-memory WAV file
-        buffer = io.BytesIO()
-        sf.write(buffer, wav_np, model.sr, format='WAV')
-        buffer.seek(0)
+        audio_prompt_path = await resolve_request_voice(request)
         
-        return StreamingResponse(
-            buffer,
-            media_type="audio/wav",
-            headers={
-                "Content-Disposition": f'attachment; filename="tts_output.wav"',
-                "X-Sample-Rate": str(model.sr),
-            }
-        )
+        if stream:
+            return stream_response(model, request, audio_prompt_path)
+        return await wav_response(model, request, audio_prompt_path)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def split_sentences(text: str) -> list[str]:
+    """Split text into sentences so audio can be generated and sent one sentence at a time"""
+    return [sentence for sentence in SENTENCE_SPLIT_RE.split(text.strip()) if sentence]
+
+async def stream_tts(model, request: TTSRequest, audio_prompt_path: Optional[str], voice_key: Optional[str] = None):
+    """Yield a streaming WAV: an open-ended header, then PCM for each sentence.
+    A producer task keeps generating the next sentences (up to STREAM_PREFETCH_SENTENCES
+    ahead) while earlier ones are encoded and sent, so the device never waits on the network.
+    """
+    chunks = asyncio.Queue(maxsize=STREAM_PREFETCH_SENTENCES)
+    
+    async def produce():
+        try:
+            for sentence in split_sentences(request.text):
+                # Semaphore is taken per sentence so long texts don't starve other requests
+                wav = await generate_audio(
+                    model,
+                    seed=request.seed,
+                    voice_key=voice_key,
+                    text=sentence,
+                    audio_prompt_path=audio_prompt_path,
+                    temperature=request.temperature,
+                    top_p=request.top_p,
+                    top_k=request.top_k,
+                    repetition_penalty=request.repetition_penalty,
+                    min_p=request.min_p,
+                    norm_loudness=request.norm_loudness,
+                )
+                # Encoding runs concurrently with generating the next sentence
+                encoded = asyncio.ensure_future(asyncio.to_thread(encode_pcm16_bytes, wav, model.sr))
+                try:
+                    await chunks.put(encoded)
+                except asyncio.CancelledError:
+                    encoded.cancel()
+                    raise
+        except asyncio.CancelledError:
+            # The consumer is gone: no sentinel, a put could block forever on the full queue
+            raise
+        except Exception:
+            # Wake the consumer, which re-raises this by awaiting the task
+            await chunks.put(None)
+            raise
+        await chunks.put(None)
+    
+    producer = asyncio.create_task(produce())
+    try:
+        yield wav_header(None, model.sr)
+        while (encoded := await chunks.get()) is not None:
+            yield await encoded
+        # Surface generation errors (aborts the truncated stream)
+        await producer
+    finally:
+        # Client disconnected or stream failed: stop generating and drop audio nobody will read
+        producer.cancel()
+        while not chunks.empty():
+            pending = chunks.get_nowait()
+            if pending is not None:
+                pending.cancel()
+        with suppress(asyncio.CancelledError, Exception):
+            await producer
+
+def stream_response(
+    model,
+    request: TTSRequest,
+    audio_prompt_path: Optional[str],
+    voice_key: Optional[str] = None,
+    background: Optional[BackgroundTask] = None,
+) -> StreamingResponse:
+    """Wrap stream_tts in a response; the open-ended WAV is sent with chunked transfer encoding"""
+    return StreamingResponse(
+        stream_tts(model, request, audio_prompt_path, voice_key),
+        media_type="audio/wav",
+        headers=STREAM_HEADERS,
+        background=background,
+    )
+
+async def tts_stream_response(request: TTSRequest) -> StreamingResponse:
+    """Resolve model and voice up front (errors must happen before the 200 is sent), then stream"""
+    try:
+        model = get_model()
+        audio_prompt_path = await resolve_request_voice(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    return stream_response(model, request, audio_prompt_path)
+
+@app.post("/api/tts/stream", dependencies=[Depends(admission_control)])
+async def generate_tts_stream(request: TTSRequest):
+    """Stream TTS audio sentence by sentence (JSON API).
+    Playback can start after the first sentence instead of after the whole text.
+    """
+    return await tts_stream_response(request)
+
+@app.get("/api/tts/stream", dependencies=[Depends(admission_control)])
+async def generate_tts_stream_get(request: TTSRequest = Depends(TTSRequest.as_query)):
+    """Stream TTS audio sentence by sentence from query parameters, usable directly as an <audio> src"""
+    return await tts_stream_response(request)
 
-@app.post("/api/tts/upload")
+@app.post("/api/tts/upload", dependencies=[Depends(admission_control)])
 async def generate_tts_upload(
-    text: str = Form(...),
+    request: TTSRequest = Depends(TTSRequest.as_form),
     audio_file: UploadFile = File(None),
-    voice_name: Optional[str] = Form(None),
-    temperature: float = Form(0.8),
-    top_p: float = Form(0.95),
-    top_k: int = Form(1000),
-    repetition_penalty: float = Form(1.2),
-    min_p: float = Form(0.0),
-    norm_loudness: bool = Form(True),
-    seed: Optional[str] = Form(None),
+    stream: bool = Query(False, description="Stream the audio sentence by sentence"),
 ):
     """Generate TTS audio with file upload support. Can use voice_name from server or upload custom audio."""
     try:
         model = get_model()
         
-        # Handle seed parameter
-        seed_int = None
-        if seed:
-            try:
-                seed_int = int(seed)
-                if seed_int != 0:
-                    set_seed(seed_int)
-            except (ValueError, TypeError):
-                pass
-        
         # Priority: uploaded file > voice_name > None
         audio_prompt_path = None
-        is_temporary_file = False  # Track if we created a temp file that needs cleanup
+        voice_key = None  # Content hash of an uploaded reference, used to cache its conditionals
+        cleanup = None  # Deletes our temp file (in the threadpool) once the response has been sent
         if audio_file:
             # Save uploaded file temporarily if provided
-            with tempfile.NamedTemporaryFile(delete=False, suffix=Path(audio_file.filename).suffix) as tmp_file:
-                content = await audio_file.read()
-                tmp_file.write(content)
-                audio_prompt_path = tmp_file.name
-                is_temporary_file = True  # Mark as temporary so we can safely delete it
-        elif voice_name:
+            audio_prompt_path, voice_key = await save_upload(audio_file)
+            cleanup = BackgroundTask(remove_upload, audio_prompt_path)
+        elif request.voice_name:
             # Use server-side voice if no file uploaded
-            audio_prompt_path = resolve_voice_path(voice_name, None)
+            audio_prompt_path = lookup_voice(request.voice_name)
             if not audio_prompt_path:
-                raise HTTPException(status_code=404, detail=f"Voice '{voice_name}' not found. Use /api/voices to list available voices.")
+                raise HTTPException(status_code=404, detail=f"Voice '{request.voice_name}' not found. Use /api/voices to list available voices.")
             # Don't mark as temporary - this is a file from voice/ folder, never delete it!
         
+        # Only clean up temporary files (uploaded files), NEVER delete files from voice/ folder
+        if stream:
+            return stream_response(model, request, audio_prompt_path, voice_key, cleanup)
+        
         try:
-            wav = model.generate(
-                text=text,
-                audio_prompt_path=audio_prompt_path,
-                temperature=temperature,
-                top_p=top_p,
-                top_k=top_k,
-                repetition_penalty=repetition_penalty,
-                min_p=min_p,
-                norm_loudness=norm_loudness,
-            )
-            
-            # Process audio
-            wav_np = process_audio(wav, model.sr)
-            
-            # Create in-memory WAV file
-            buffer = io.BytesIO()
-            sf.write(buffer, wav_np, model.sr, format='WAV')
-            buffer.seek(0)
-            
-            return StreamingResponse(
-                buffer,
-                media_type="audio/wav",
-                headers={
-                    "Content-Disposition": f'attachment; filename="tts_output.wav"',
-                    "X-Sample-Rate": str(model.sr),
-                }
-            )
-        finally:
-            # Only clean up temporary files (uploaded files), NEVER delete files from voice/ folder
-            if is_temporary_file and audio_prompt_path and os.path.exists(audio_prompt_path):
-                os.unlink(audio_prompt_path)
+            response = await wav_response(model, request, audio_prompt_path, voice_key)
+        except BaseException:
+            if cleanup:
+                remove_upload(audio_prompt_path)
+            raise
+        response.background = cleanup
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -857,6 +985,27 @@ async def health_check():
         "device": DEVICE,
         "model_loaded": "model" in MODEL_CACHE,
         "cuda_available": torch.cuda.is_available(),
+        "max_concurrency": TTS_CONCURRENCY,
+        "generations_running": GENERATIONS_RUNNING,
+        "generations_waiting": GENERATIONS_WAITING,
+    }
+
+@app.post("/api/admin/empty_cache")
+async def empty_cache(x_admin_token: Optional[str] = Header(None)):
+    """Release unused CUDA caching-allocator memory on demand (per request only with TTS_EMPTY_CACHE=1)"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if not torch.cuda.is_available():
+        return {"cuda_available": False}
+    reserved_before = torch.cuda.memory_reserved()
+    await asyncio.to_thread(release_cuda_memory)
+    return {
+        "cuda_available": True,
+        "memory_allocated": torch.cuda.memory_allocated(),
+        "memory_reserved_before": reserved_before,
+        "memory_reserved": torch.cuda.memory_reserved(),
     }
 
 @app.get("/api/tags")
@@ -866,19 +1015,8 @@ async def get_tags():
 
 @app.get("/api/voices")
 async def get_voices():
-    """Get list of available voice files from voice/ folder"""
-    # Return unique voice names (without duplicates from extension variations)
-    unique_voices = {}
-    for key, path in AVAILABLE_VOICES.items():
-        if key.endswith('.wav'):
-            unique_voices[key] = path
-        elif f"{key}.wav" not in AVAILABLE_VOICES:
-            unique_voices[key] = path
-    
-    return {
-        "voices": sorted(unique_voices.keys()),
-        "count": len(set(AVAILABLE_VOICES.values()))
-    }
+    """Get list of available voice files from voice/ folder (built once per scan_voice_folder)"""
+    return VOICES_RESPONSE
 
 if __name__ == "__main__":
     import argparse
@@ -886,13 +1024,33 @@ if __name__ == "__main__":
     parser.add_argument("--host", default="0.0.0.0", help="Host to bind to")
     parser.add_argument("--port", type=int, default=8000, help="Port to bind to")
     parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--compile", action="store_true", help="torch.compile the model at startup")
+    parser.add_argument("--max-concurrency", type=int, help="Max generations on the device at once per worker (TTS_CONCURRENCY)")
     args = parser.parse_args()
     
+    # Passed via the environment so it reaches the app imported by uvicorn
+    if args.compile:
+        os.environ["TTS_COMPILE"] = "1"
+    if args.max_concurrency is not None:
+        if args.max_concurrency < 1:
+            parser.error("--max-concurrency must be at least 1")
+        os.environ["TTS_CONCURRENCY"] = str(args.max_concurrency)
+    
+    # Workers are not pinned to GPUs: every worker process loads its own copy of the model onto DEVICE
+    if args.workers > 1 and DEVICE == "cuda":
+        print(
+            f"Warning: {args.workers} workers will each load a copy of the model onto the same GPU; "
+            "prefer --workers 1, or one server per GPU selected with CUDA_VISIBLE_DEVICES"
+        )
+    
     uvicorn.run(
         "app:app",
         host=args.host,
         port=args.port,
         workers=args.workers,
-        log_level="info"
+        log_level="info",
+        # uvloop/httptools are picked automatically when installed (uvicorn[standard]);
+        # slow requests are logged by SlowRequestLogger instead of an access-log line per request
+        access_log=False,
     )
 
@@ -17,7 +17,10 @@ if isinstance(wav, torch.Tensor):
     wav = wav.cpu().numpy()
 
 # Ensure correct shape: soundfile expects (samples,) for mono or (samples, channels) for stereo
-if wav.ndim > 1:
+if wav.ndim == 2 and wav.shape[0] == 1:
+    # Usual mono model output (1, samples): take the row as a view, no transpose/squeeze needed
+    wav = wav[0]
+elif wav.ndim > 1:
     # If shape is (channels, samples), transpose to (samples, channels)
     if wav.shape[0] < wav.shape[1]:
         wav = wav.T
@@ -27,12 +30,10 @@ if wav.ndim > 1:
     elif wav.shape[1] == 1:
         wav = wav.squeeze(1)
 
-# Ensure float32 format
-if wav.dtype != 'float32':
-    wav = wav.astype('float32')
+# Ensure float32 format (no copy if it already is) and clip to [-1, 1] in place,
+# so the samples are swept once instead of allocating a new array per step
+wav = wav.astype(np.float32, copy=False)
+np.clip(wav, -1.0, 1.0, out=wav)
 
-# Normalize if needed (clip to [-1, 1])
-wav = np.clip(wav, -1.0, 1.0)
-
-# Save audio file
-sf.write("test-turbo.wav", wav, model.sr)
\ No newline at end of file
+# Save audio file as 16-bit PCM (spelled out rather than relying on libsndfile's WAV default)
+sf.write("test-turbo.wav", wav, model.sr, subtype="PCM_16")
\ No newline at end of file